@@ -1,9 +1,49 @@
-from datetime import datetime, timedelta
-import pytz
+from datetime import datetime, timedelta, timezone
+
+try:
+    import ciso8601
+except ImportError:
+    ciso8601 = None
+
+UTC = timezone.utc
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_epoch_us(dt):
+    """Converts an aware datetime to integer microseconds since the epoch."""
+    return (dt - EPOCH) // ONE_MICROSECOND
+
+
+def from_epoch_us(epoch_us, tz=UTC):
+    """Converts integer microseconds since the epoch to an aware datetime."""
+    return (EPOCH + timedelta(microseconds=int(epoch_us))).astimezone(tz)
+
+
+def _parse_datetime(value, tz):
+    """
+    Parses an API ISO 8601 timestamp into an aware datetime in `tz`.
+    Uses ciso8601 when installed, otherwise the C-implemented
+    datetime.fromisoformat. UTC results skip the astimezone() round trip.
+    """
+    if ciso8601 is not None:
+        parsed = ciso8601.parse_datetime(value)
+    else:
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            # Python < 3.11 does not accept a 'Z' suffix
+            if not value.endswith('Z'):
+                raise
+            parsed = datetime.fromisoformat(value[:-1] + '+00:00')
+
+    if parsed.tzinfo is not tz:
+        parsed = parsed.astimezone(tz)
+    return parsed
 
 
 class CalendarEvent:
-    def __init__(self, api_data, comparison_timezone=pytz.utc):
+    def __init__(self, api_data, comparison_timezone=UTC):
         self._data = api_data
         self.tz = comparison_timezone
         self._parse_times()
@@ -14,9 +54,8 @@ class CalendarEvent:
             end_str = self._data['end'].get('dateTime')
 
             if start_str and end_str:
-                self.start = datetime.fromisoformat(
-                    start_str).astimezone(self.tz)
-                self.end = datetime.fromisoformat(end_str).astimezone(self.tz)
+                self.start = _parse_datetime(start_str, self.tz)
+                self.end = _parse_datetime(end_str, self.tz)
             else:
                 self.start = None
                 self.end = None
@@ -24,6 +63,14 @@ class CalendarEvent:
             self.start = None
             self.end = None
 
+        # Integer epoch microseconds for comparisons and arithmetic
+        if self.is_valid:
+            self.start_us = to_epoch_us(self.start)
+            self.end_us = to_epoch_us(self.end)
+        else:
+            self.start_us = None
+            self.end_us = None
+
     @property
     def is_valid(self):
         return self.start is not None and self.end is not None
@@ -38,27 +85,31 @@ class CalendarEvent:
         if not self.is_valid:
             return "FREE", None
 
-        # 1. Active: BUSY
-        if self.start <= now_utc < self.end:
-            return "BUSY", self.end + timedelta(microseconds=1)
-
-        # 2. Upcoming: PENDING (Short window)
-        if self.start - pending_delta <= now_utc < self.start:
-            return "PENDING", self.start
-
-        # 3. Upcoming: PREPARE (Long window, optional)
-        if has_prepare_status and prepare_delta > pending_delta:
-            if (self.start - prepare_delta <= now_utc <
-                    self.start - pending_delta):
-                return "PREPARE", self.start - pending_delta
-            elif self.start > now_utc:
-                # Future event, waiting for PREPARE start
-                return "FREE", self.start - prepare_delta
-
-        # 4. Future event (waiting for PENDING start, if no PREPARE or
-        # before PREPARE)
-        if self.start > now_utc:
-            return "FREE", self.start - pending_delta
-
-        # Fallback
-        return "FREE", None
+        start = self.start_us
+        end = self.end_us
+        now = to_epoch_us(now_utc)
+        pending = pending_delta // ONE_MICROSECOND
+        prepare = prepare_delta // ONE_MICROSECOND
+        pending_start = start - pending
+
+        if start <= now < end:
+            # 1. Active: BUSY
+            status, transition = "BUSY", end + 1
+        elif pending_start <= now < start:
+            # 2. Upcoming: PENDING (Short window)
+            status, transition = "PENDING", start
+        elif now >= start:
+            # Past event
+            return "FREE", None
+        elif has_prepare_status and prepare > pending:
+            # 3. Upcoming: PREPARE (Long window, optional), or waiting
+            # for PREPARE to start
+            if start - prepare <= now:
+                status, transition = "PREPARE", pending_start
+            else:
+                status, transition = "FREE", start - prepare
+        else:
+            # 4. Future event (waiting for PENDING start)
+            status, transition = "FREE", pending_start
+
+        return status, from_epoch_us(transition, now_utc.tzinfo)
@@ -1,19 +1,146 @@
 import os
+import logging
+import time
 import threading
-import pytz
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import httplib2
+import google_auth_httplib2
 from datetime import datetime, timedelta
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 import config
-from calendar_event import CalendarEvent
+from calendar_event import (
+    CalendarEvent, UTC, EPOCH, to_epoch_us, from_epoch_us)
+
+logger = logging.getLogger('dashboard.calendar')
+
+# Parsed event arrays for calendars with no cached events
+EMPTY_EVENTS = {
+    'starts': np.empty(0, dtype=np.int64),
+    'ends': np.empty(0, dtype=np.int64),
+    'meta': []
+}
+
+# Event window requested on a full fetch. Incremental syncs only report
+# changed events, so they are used only while the last full window still
+# covers at least SYNC_MIN_HORIZON ahead (longer than the max fetch
+# interval).
+FETCH_WINDOW_PAST = timedelta(hours=4)
+FETCH_WINDOW_FUTURE = timedelta(hours=48)
+SYNC_MIN_HORIZON = timedelta(hours=24)
+
+# Window within which check_status calls share one datetime.now() value
+NOW_CACHE_SECONDS = 0.05
+
+# Integer status codes, in priority order: BUSY > PENDING > PREPARE > FREE
+STATUS_BY_CODE = ('FREE', 'PREPARE', 'PENDING', 'BUSY')
+
+
+# --- STATUS RESOLUTION KERNELS ---
+# Both take start-sorted int64 epoch arrays plus integer windows and return
+# (status_code, next_change_us), with -1 when nothing is scheduled.
+
+def _resolve_loop(starts, ends, now_us, pending_us, prepare_us, has_prepare):
+    lead_us = prepare_us if has_prepare else pending_us
+    status_code = 0
+    next_change_us = -1
+
+    for i in range(starts.shape[0]):
+        start = starts[i]
+        if start - lead_us > now_us:
+            # Sorted by start: this and every later event is still FREE,
+            # and this one's lead-in is the earliest of their transitions.
+            transition = start - lead_us
+            if next_change_us < 0 or transition < next_change_us:
+                next_change_us = transition
+            break
+
+        if start <= now_us and now_us < ends[i]:
+            code = 3
+            transition = ends[i] + 1
+        elif start - pending_us <= now_us and now_us < start:
+            code = 2
+            transition = start
+        elif has_prepare and now_us < start - pending_us:
+            code = 1
+            transition = start - pending_us
+        else:
+            # Past event
+            continue
+
+        if code > status_code:
+            status_code = code
+        if next_change_us < 0 or transition < next_change_us:
+            next_change_us = transition
+
+    return status_code, next_change_us
+
+
+# Sentinel for empty minimum reductions
+_NO_CHANGE_US = np.iinfo(np.int64).max
+
+
+def _resolve_vectorized(
+    starts, ends, now_us, pending_us, prepare_us, has_prepare
+):
+    lead_us = prepare_us if has_prepare else pending_us
+
+    # Everything starting after now + lead is still FREE and only the first
+    # of those can be the next change. Restrict the mask work to the events
+    # before it.
+    cutoff = np.searchsorted(starts, now_us + lead_us, side='right')
+    waiting_until = _NO_CHANGE_US
+    if cutoff < starts.size:
+        waiting_until = starts[cutoff] - lead_us
+    starts = starts[:cutoff]
+    ends = ends[:cutoff]
+
+    # Boolean masks per state; an event matches at most one of them
+    pending_starts = starts - pending_us
+    busy = (starts <= now_us) & (now_us < ends)
+    pending = (pending_starts <= now_us) & (now_us < starts)
+    prepare = (
+        has_prepare & (starts - prepare_us <= now_us)
+        & (now_us < pending_starts))
+
+    status_code = int(np.max(3 * busy + 2 * pending + prepare, initial=0))
+
+    # Every masked transition lies strictly in the future
+    next_change_us = int(min(
+        np.min(ends + 1, where=busy, initial=_NO_CHANGE_US),
+        np.min(starts, where=pending, initial=_NO_CHANGE_US),
+        np.min(pending_starts, where=prepare, initial=_NO_CHANGE_US),
+        waiting_until,
+    ))
+    if next_change_us == _NO_CHANGE_US:
+        next_change_us = -1
+
+    return status_code, next_change_us
+
+
+# Compiled eagerly (and cached on disk) when Numba is installed; the NumPy
+# version is used otherwise.
+_KERNEL_SIGNATURE = (
+    'UniTuple(int64, 2)(int64[:], int64[:], int64, int64, int64, boolean)')
+
+_resolve_kernel = None
+if njit is not None:
+    _resolve_kernel = njit(_KERNEL_SIGNATURE, cache=True)(_resolve_loop)
 
 
 # --- GOOGLE AUTHENTICATION ---
 
-def get_google_service():
-    """Authenticates with Google and returns the Calendar service object."""
+def get_google_credentials():
+    """Authenticates with Google and returns valid OAuth credentials."""
     creds = None
 
     if os.path.exists(config.TOKEN_FILE):
@@ -37,6 +164,13 @@ def get_google_service():
         with open(config.TOKEN_FILE, 'w') as token:
             token.write(creds.to_json())
 
+    return creds
+
+
+def get_google_service(creds=None):
+    """Authenticates with Google and returns the Calendar service object."""
+    if creds is None:
+        creds = get_google_credentials()
     return build('calendar', 'v3', credentials=creds)
 
 
@@ -44,155 +178,301 @@ class CalendarManager:
     def __init__(self, calendar_configs):
         self.configs = calendar_configs
         self._local_event_cache = {}
-        self._last_cache_update = datetime(1970, 1, 1, tzinfo=pytz.utc)
+        self._last_cache_update = EPOCH
         self._computed_cache = {
             'statuses': [],
-            'valid_until': datetime(1970, 1, 1, tzinfo=pytz.utc)
+            'next_change': None,
+            # POSIX seconds of next_change, for callers scheduling on it
+            'next_change_ts': None,
+            'valid_until': EPOCH
         }
         self._lock = threading.Lock()
-
-        # Priority for status display: BUSY > PENDING > PREPARE > FREE
-        self.PRIORITY_MAP = {
-            'BUSY': 3,
-            'PENDING': 2,
-            'PREPARE': 1,
-            'FREE': 0,
-            'ERROR': -1
-        }
+        # (monotonic time, aware UTC now) shared by calls arriving together
+        self._now_cache = (float('-inf'), None)
+        # Coalesces concurrent API fetches into one
+        self._fetch_lock = threading.Lock()
+        self._fetch_in_progress = False
+        # Per-calendar incremental sync state (events, token, window_end)
+        self._sync_state = {}
+        # Parsed events keyed by (id, updated), reused across API fetches
+        self._event_obj_cache = {}
 
     def _fetch_from_api(self):
         try:
-            service = get_google_service()
+            creds = get_google_credentials()
+            service = get_google_service(creds)
             new_cache = {}
-            now_utc = datetime.now(pytz.utc)
-
-            # Fetch events: 4h past to 48h future
-            time_min = (now_utc - timedelta(hours=4)).isoformat()
-            time_max = (now_utc + timedelta(hours=48)).isoformat()
-
-            for item in self.configs:
-                events_result = service.events().list(
-                    calendarId=item["calendar_id"],
-                    timeMin=time_min,
-                    timeMax=time_max,
-                    singleEvents=True,
-                    orderBy='startTime'
-                ).execute()
-                new_cache[item["id"]] = events_result.get('items', [])
+            new_event_objs = {}
+            now_utc = datetime.now(UTC)
+
+            # Calendars are independent, so fetch them concurrently
+            workers = max(len(self.configs), 1)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    item.id: executor.submit(
+                        self._sync_calendar, service, creds,
+                        item.calendar_id,
+                        self._sync_state.get(item.id), now_utc)
+                    for item in self.configs
+                }
+                new_sync_state = {
+                    cal_id: future.result()
+                    for cal_id, future in futures.items()
+                }
+
+            for cal_id, state in new_sync_state.items():
+                new_cache[cal_id] = self._parse_events(
+                    list(state['events'].values()), new_event_objs)
 
             with self._lock:
                 self._local_event_cache = new_cache
+                self._sync_state = new_sync_state
+                # Keep only parsed events present in the new fetch
+                self._event_obj_cache = new_event_objs
                 self._last_cache_update = now_utc
                 # Invalidate computation cache
-                self._computed_cache['valid_until'] = datetime(
-                    1970, 1, 1, tzinfo=pytz.utc)
+                self._computed_cache['valid_until'] = EPOCH
 
-            print("API Fetch successful. Cache updated.")
+            logger.info("API Fetch successful. Cache updated.")
 
         except Exception as e:
-            print(f"FATAL ERROR during Google Calendar API fetch: {e}")
+            logger.error("FATAL ERROR during Google Calendar API fetch: %s", e)
+
+    def _sync_calendar(self, service, creds, calendar_id, state, now_utc):
+        """
+        Returns the calendar's new sync state: its events by id, the
+        nextSyncToken and the end of the window they cover.
+        While the previous token is valid and its window still reaches
+        far enough ahead, only the changes since then are requested.
+        Otherwise the full window is fetched again.
+        """
+        # The service's shared httplib2 connection is not thread-safe, so
+        # each calendar's requests execute on their own connection.
+        http = google_auth_httplib2.AuthorizedHttp(
+            creds, http=httplib2.Http())
+
+        if (state and state['token'] and
+                state['window_end'] - now_utc >= SYNC_MIN_HORIZON):
+            try:
+                items, token = self._list_events(
+                    service, http,
+                    calendarId=calendar_id,
+                    syncToken=state['token'],
+                    singleEvents=True
+                )
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                logger.info("Sync token for %s expired. Fetching full window.",
+                            calendar_id)
+            else:
+                events = dict(state['events'])
+                for item in items:
+                    if item.get('status') == 'cancelled':
+                        events.pop(item['id'], None)
+                    else:
+                        events[item['id']] = item
+                return {
+                    'events': events,
+                    'token': token,
+                    'window_end': state['window_end']
+                }
+
+        # Fetch events: 4h past to 48h future. orderBy is left out as it
+        # cannot be combined with sync tokens; _parse_events sorts instead.
+        window_end = now_utc + FETCH_WINDOW_FUTURE
+        items, token = self._list_events(
+            service, http,
+            calendarId=calendar_id,
+            timeMin=(now_utc - FETCH_WINDOW_PAST).isoformat(),
+            timeMax=window_end.isoformat(),
+            singleEvents=True
+        )
+        return {
+            'events': {item['id']: item for item in items},
+            'token': token,
+            'window_end': window_end
+        }
 
-    def _resolve_status_for_calendar(
-        self, calendar_id, events, config_item, now_utc
-    ):
-        current_calendar_status = "FREE"
-        current_max_priority = 0
-        next_change_time = None
+    def _list_events(self, service, http, **params):
+        """Pages through events().list; returns (items, nextSyncToken)."""
+        items = []
+        page_token = None
+
+        while True:
+            events_result = service.events().list(
+                pageToken=page_token, **params).execute(http=http)
+            items.extend(events_result.get('items', []))
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return items, events_result.get('nextSyncToken')
+
+    def _fetch_single_flight(self):
+        """
+        Runs _fetch_from_api unless another thread is already fetching, in
+        which case the caller proceeds with the current cache.
+        """
+        with self._fetch_lock:
+            if self._fetch_in_progress:
+                return
+            self._fetch_in_progress = True
 
-        status_map = config_item['statuses']
-        pending_delta = timedelta(
-            minutes=config_item.get('pending_minutes', 15))
+        try:
+            self._fetch_from_api()
+        finally:
+            with self._fetch_lock:
+                self._fetch_in_progress = False
+
+    def _parse_events(self, events, event_objs=None):
+        """
+        Parses raw API events once into Struct-of-Arrays int64 epochs
+        (microseconds). All-day and malformed events are skipped up front.
+        Events unchanged since the last fetch (same id and updated stamp)
+        reuse their previously parsed CalendarEvent; every parsed event is
+        recorded in `event_objs` when given.
+        """
+        starts = []
+        ends = []
+        meta = []
 
-        prepare_delta = pending_delta
-        if 'PREPARE' in status_map:
-            prepare_minutes = config_item.get('prepare_minutes', 60)
-            prepare_delta = timedelta(minutes=prepare_minutes)
+        for event_data in events:
+            key = None
+            event = None
+            if 'id' in event_data:
+                key = (event_data['id'], event_data.get('updated', ''))
+                event = self._event_obj_cache.get(key)
 
-        has_prepare_status = 'PREPARE' in status_map
+            if event is None:
+                event = CalendarEvent(event_data)
+
+            if key is not None and event_objs is not None:
+                event_objs[key] = event
 
-        for event_data in events:
-            event = CalendarEvent(
-                event_data, comparison_timezone=now_utc.tzinfo)
             if not event.is_valid:
                 continue
 
-            status, transition_time = event.get_status(
-                now_utc, pending_delta, prepare_delta, has_prepare_status
-            )
+            starts.append(event.start_us)
+            ends.append(event.end_us)
+            meta.append(event_data)
 
-            priority = self.PRIORITY_MAP.get(status, -1)
-            if priority > current_max_priority:
-                current_max_priority = priority
-                current_calendar_status = status
+        # The API already orders by start time; the stable sort keeps that
+        # order and guarantees it for the status resolution cutoff.
+        starts = np.array(starts, dtype=np.int64)
+        order = np.argsort(starts, kind='stable')
 
-            if transition_time and transition_time > now_utc:
-                if (next_change_time is None or
-                        transition_time < next_change_time):
-                    next_change_time = transition_time
+        return {
+            'starts': starts[order],
+            'ends': np.array(ends, dtype=np.int64)[order],
+            'meta': [meta[i] for i in order]
+        }
 
-        return current_calendar_status, next_change_time, status_map
+    def _resolve_status_for_calendar(
+        self, calendar_id, events, config_item, now_utc
+    ):
+        resolve = _resolve_kernel or _resolve_vectorized
+        status_code, next_change_us = resolve(
+            events['starts'], events['ends'], to_epoch_us(now_utc),
+            config_item.pending_us, config_item.prepare_us,
+            config_item.has_prepare
+        )
+
+        next_change_time = None
+        if next_change_us >= 0:
+            next_change_time = from_epoch_us(next_change_us, now_utc.tzinfo)
+
+        return STATUS_BY_CODE[status_code], next_change_time
+
+    def _get_now(self):
+        """
+        Returns the current UTC time, reusing the last value for calls made
+        within NOW_CACHE_SECONDS of it (e.g. a burst of socket reconnects).
+        """
+        mono = time.monotonic()
+        cached_mono, cached_now = self._now_cache
+        if mono - cached_mono < NOW_CACHE_SECONDS:
+            return cached_now
+
+        now_utc = datetime.now(UTC)
+        self._now_cache = (mono, now_utc)
+        return now_utc
+
+    @property
+    def next_change_timestamp(self):
+        """
+        POSIX timestamp of the next change from the last status
+        computation, or None when nothing is scheduled.
+        """
+        return self._computed_cache['next_change_ts']
 
     def check_status(self, force_fetch=False):
-        now_utc = datetime.now(pytz.utc)
+        now_utc = self._get_now()
         max_interval = config.CALENDAR_MAX_FETCH_INTERVAL_SECONDS
 
         # Check if we need API fetch
         time_since_last = (now_utc - self._last_cache_update).total_seconds()
         if force_fetch or time_since_last > max_interval:
-            self._fetch_from_api()
+            self._fetch_single_flight()
 
-        # Check computation cache
+        # Snapshot under the lock; _fetch_from_api swaps in new event
+        # dicts rather than mutating them, so the snapshot stays consistent
+        # while statuses are computed without holding the lock.
         with self._lock:
-            if now_utc < self._computed_cache['valid_until']:
-                return (
-                    self._computed_cache['statuses'],
-                    self._computed_cache['valid_until']
-                )
-            else:
-                print(f"DEBUG: CACHE MISS. Now: {now_utc} "
-                      f"vs Valid Until: {self._computed_cache['valid_until']}")
+            event_cache = self._local_event_cache
+            cached_statuses = self._computed_cache['statuses']
+            cached_next_change = self._computed_cache['next_change']
+            cached_valid_until = self._computed_cache['valid_until']
+
+        # Check computation cache
+        if now_utc < cached_valid_until:
+            return cached_statuses, cached_next_change
+        else:
+            logger.debug("CACHE MISS. Now: %s vs Valid Until: %s",
+                         now_utc, cached_valid_until)
 
         # Re-compute status
         current_statuses = []
         global_next_change_time = None
 
-        with self._lock:
-            for item in self.configs:
-                cal_id = item["id"]
-                events = self._local_event_cache.get(cal_id, [])
-
-                cal_status, cal_next_change, status_map = (
-                    self._resolve_status_for_calendar(
-                        cal_id, events, item, now_utc
-                    )
-                )
+        for item in self.configs:
+            cal_id = item.id
+            events = event_cache.get(cal_id, EMPTY_EVENTS)
 
-                if cal_next_change:
-                    if global_next_change_time is None:
-                        global_next_change_time = cal_next_change
-                    elif cal_next_change < global_next_change_time:
-                        global_next_change_time = cal_next_change
-
-                status_details = status_map.get(
-                    cal_status, status_map.get('ERROR', {}))
-                if not status_details:
-                    status_details = {'class': '', 'text': ''}
-
-                current_statuses.append({
-                    "id": cal_id,
-                    "name": item["name"],
-                    "status": cal_status,
-                    "css_class": status_details.get('class', ''),
-                    "display_text": status_details.get('text', ''),
-                })
-
-            # Update cache
-            if global_next_change_time:
-                valid_until = global_next_change_time
-            else:
-                valid_until = now_utc + timedelta(days=365)
+            cal_status, cal_next_change = self._resolve_status_for_calendar(
+                cal_id, events, item, now_utc
+            )
 
-            self._computed_cache['statuses'] = current_statuses
-            self._computed_cache['valid_until'] = valid_until
+            if cal_next_change:
+                if global_next_change_time is None:
+                    global_next_change_time = cal_next_change
+                elif cal_next_change < global_next_change_time:
+                    global_next_change_time = cal_next_change
+
+            css_class, display_text = item.status_lookup.get(
+                cal_status, ('', ''))
+
+            current_statuses.append({
+                "id": cal_id,
+                "name": item.name,
+                "status": cal_status,
+                "css_class": css_class,
+                "display_text": display_text,
+            })
+
+        # Update cache
+        if global_next_change_time:
+            valid_until = global_next_change_time
+        else:
+            valid_until = now_utc + timedelta(days=365)
+
+        with self._lock:
+            # Skip the write-back if a fetch swapped the events meanwhile;
+            # it already invalidated the computation cache.
+            if self._local_event_cache is event_cache:
+                self._computed_cache['statuses'] = current_statuses
+                self._computed_cache['next_change'] = global_next_change_time
+                self._computed_cache['next_change_ts'] = (
+                    global_next_change_time.timestamp()
+                    if global_next_change_time else None)
+                self._computed_cache['valid_until'] = valid_until
 
         return current_statuses, global_next_change_time
@@ -1,5 +1,8 @@
 # config.py
 
+from dataclasses import dataclass, field
+from datetime import timedelta
+
 # --- POLLING INTERVALS ---
 
 ESO_POLL_INTERVAL = 60
@@ -9,47 +12,99 @@ CALENDAR_MAX_FETCH_INTERVAL_SECONDS = 12 * 3600  # 12 hours
 
 # --- GOOGLE CALENDAR CONFIGURATION ---
 
+# Statuses a calendar can resolve to (ERROR is the display fallback)
+CALENDAR_STATUSES = ('FREE', 'PREPARE', 'PENDING', 'BUSY', 'ERROR')
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+@dataclass(frozen=True, slots=True)
+class CalConfig:
+    """
+    A calendar to check. The status windows and display lookups are
+    derived once at construction.
+    """
+    id: str
+    calendar_id: str
+    name: str
+    statuses: dict
+    pending_minutes: int = 15   # The SHORT window
+    prepare_minutes: int = 60   # The LONG window (only with PREPARE)
+
+    pending_delta: timedelta = field(init=False)
+    prepare_delta: timedelta = field(init=False)
+    has_prepare: bool = field(init=False)
+    pending_us: int = field(init=False)
+    prepare_us: int = field(init=False)
+    # (css_class, display_text) per status; unknown ones fall back to ERROR
+    status_lookup: dict = field(init=False)
+
+    def __post_init__(self):
+        pending_delta = timedelta(minutes=self.pending_minutes)
+        prepare_delta = pending_delta
+        if 'PREPARE' in self.statuses:
+            prepare_delta = timedelta(minutes=self.prepare_minutes)
+
+        status_lookup = {}
+        for status in CALENDAR_STATUSES:
+            details = self.statuses.get(
+                status, self.statuses.get('ERROR', {}))
+            status_lookup[status] = (
+                details.get('class', ''), details.get('text', ''))
+
+        derived = {
+            'pending_delta': pending_delta,
+            'prepare_delta': prepare_delta,
+            'has_prepare': (
+                'PREPARE' in self.statuses and prepare_delta > pending_delta),
+            'pending_us': pending_delta // _ONE_MICROSECOND,
+            'prepare_us': prepare_delta // _ONE_MICROSECOND,
+            'status_lookup': status_lookup,
+        }
+        for name, value in derived.items():
+            object.__setattr__(self, name, value)
+
+
 # List of calendar IDs to check.
 # STATUSES dictionary now groups class and text for each state.
 CALENDAR_CONFIGS = [
-    {
-        'id': 'primary',
-        'calendar_id': 'primary',
-        'name': 'Primary Calendar',
-        'pending_minutes': 15,
-        'statuses': {
+    CalConfig(
+        id='primary',
+        calendar_id='primary',
+        name='Primary Calendar',
+        pending_minutes=15,
+        statuses={
             'FREE':    {'class': 'status-green',  'text': 'FREE'},
             'PENDING': {'class': 'status-yellow', 'text': 'SOON'},
             'BUSY':    {'class': 'status-red',    'text': 'BUSY'},
             'ERROR':   {'class': 'status-orange', 'text': 'ERROR'},
         }
-    },
-    {
-        'id': 'ESO',
-        'calendar_id': '507igmu5ucighkk0et6je2oils@group.calendar.google.com',
-        'name': 'ESO',
-        'pending_minutes': 15,
-        'statuses': {
+    ),
+    CalConfig(
+        id='ESO',
+        calendar_id='507igmu5ucighkk0et6je2oils@group.calendar.google.com',
+        name='ESO',
+        pending_minutes=15,
+        statuses={
             'FREE':    {'class': 'status-transparent', 'text': ''},
             'PENDING': {'class': 'status-yellow',      'text': 'ARM'},
             'BUSY':    {'class': 'status-purple',      'text': 'KILL'},
             'ERROR':   {'class': 'status-orange',      'text': 'ERROR'}
         }
-    },
-    {
-        'id': 'medical',
-        'calendar_id': 'fhu26gklo4t5jonio3sv9o1i18@group.calendar.google.com',
-        'name': 'Medical Appointments',
-        'pending_minutes': 30,  # The SHORT window (30 minutes)
-        'prepare_minutes': 60,  # The LONG window (60 minutes)
-        'statuses': {
+    ),
+    CalConfig(
+        id='medical',
+        calendar_id='fhu26gklo4t5jonio3sv9o1i18@group.calendar.google.com',
+        name='Medical Appointments',
+        pending_minutes=30,  # The SHORT window (30 minutes)
+        prepare_minutes=60,  # The LONG window (60 minutes)
+        statuses={
             'FREE':    {'class': 'status-transparent',  'text': ''},
             'PREPARE': {'class': 'status-blue', 'text': 'PREP'},
             'PENDING': {'class': 'medical-go',    'text': 'LEAVE'},
             'BUSY':    {'class': 'medical-busy',  'text': 'APT'},
             'ERROR':   {'class': 'status-orange', 'text': 'ERROR'},
         }
-    }
+    )
 ]
 
 # --- ESO DISPLAY CONFIGURATION ---
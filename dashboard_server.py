@@ -1,150 +1,319 @@
-import os
-import time
-import threading
-from datetime import datetime
-from flask import Flask, render_template, jsonify, request
-from flask_socketio import SocketIO
-import config
-from calendar_manager import CalendarManager
-import eso_status_poller
-
+# Monkey-patch the stdlib before anything else imports socket/threading so
+# the pollers and the Google/ESO HTTP calls cooperate with eventlet.
+import eventlet
+eventlet.monkey_patch()
+
+import os  # noqa: E402
+import logging  # noqa: E402
+import logging.handlers  # noqa: E402
+import queue  # noqa: E402
+import atexit  # noqa: E402
+import hashlib  # noqa: E402
+import random  # noqa: E402
+import sched  # noqa: E402
+import time  # noqa: E402
+import threading  # noqa: E402
+from flask import Flask, render_template, request  # noqa: E402
+from flask_caching import Cache  # noqa: E402
+from flask_socketio import SocketIO  # noqa: E402
+import orjson  # noqa: E402
+import config  # noqa: E402
+from calendar_manager import CalendarManager  # noqa: E402
+import eso_status_poller  # noqa: E402
+
+
+# --- LOGGING ---
+# Records are written to stderr by a QueueListener thread, so the pollers
+# and request handlers never block on the stream themselves.
+LOG_QUEUE = queue.Queue(-1)
+logger = logging.getLogger('dashboard')
+logger.setLevel(logging.INFO)
+logger.propagate = False
+logger.addHandler(logging.handlers.QueueHandler(LOG_QUEUE))
+
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(
+    logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+LOG_LISTENER = logging.handlers.QueueListener(LOG_QUEUE, _log_stream_handler)
+LOG_LISTENER.start()
+atexit.register(LOG_LISTENER.stop)
 
 # --- FLASK SETUP ---
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get(
     'SECRET_KEY', 'your_default_secret_key')
-socketio = SocketIO(app)
+socketio = SocketIO(app, async_mode='eventlet')
+cache = Cache(app, config={
+    'CACHE_TYPE': 'SimpleCache',
+    'CACHE_DEFAULT_TIMEOUT': 1,
+})
 
 # --- GLOBAL SINGLETONS ---
 CALENDAR_MANAGER = CalendarManager(config.CALENDAR_CONFIGS)
 
+# --- STATIC CONFIG ---
+ESO_POLL_INTERVAL = getattr(config, 'ESO_POLL_INTERVAL', 300)
+
+_ESO_CONFIG_PAYLOAD = {
+    'NA_DISPLAY_NAME': config.ESO_CONFIG['NA_DISPLAY_NAME'],
+    'EU_DISPLAY_NAME': config.ESO_CONFIG['EU_DISPLAY_NAME'],
+}
+
+
+def _collect_possible_texts():
+    """
+    Collects all possible text labels from config to help the client
+    scale fonts.
+    """
+    all_possible_texts = set()
+    for cal_config in config.CALENDAR_CONFIGS:
+        for status_info in cal_config.statuses.values():
+            text = status_info.get('text', '')
+            if text:
+                all_possible_texts.add(text)
+
+    # Add ESO names too
+    all_possible_texts.add(config.ESO_CONFIG.get('NA_DISPLAY_NAME', 'PC-NA'))
+    all_possible_texts.add(config.ESO_CONFIG.get('EU_DISPLAY_NAME', 'PC-EU'))
+
+    return list(all_possible_texts)
+
+
+_ALL_POSSIBLE_TEXTS = _collect_possible_texts()
+
 # --- GLOBAL CACHE AND RATE LIMITING ---
+# Replaced wholesale on each poll, never mutated, so readers holding a
+# reference always see one consistent snapshot without a lock
 ESO_STATUS_CACHE = {
     "PC NA": "N/A",
     "PC EU": "N/A",
 }
 
-# Global variable to track the last manual refresh time
-# (initialized to a time far in the past)
-LAST_MANUAL_REFRESH_TIME = datetime(1970, 1, 1)
-CALENDAR_WAKE_EVENT = threading.Event()
+# Global variable to track the last manual refresh time as a monotonic
+# timestamp (initialized so the first refresh is always allowed)
+LAST_MANUAL_REFRESH_TIME = float('-inf')
+REFRESH_LOCK = threading.Lock()
+SHUTDOWN_EVENT = threading.Event()
+
+# Pending scheduler entry per job, so a job can be moved or cancelled
+SCHEDULER_WAKE_EVENT = threading.Event()
+SCHEDULE_LOCK = threading.Lock()
+_SCHEDULED_JOBS = {}
 
-# --- THREAD WORKERS ---
+# Last payload pushed over Socket.IO, used to send only what changed
+LAST_EMITTED_PAYLOAD = {}
+_LAST_EMIT_HASH = None
+EMIT_LOCK = threading.Lock()
 
+# Recently built dashboard payload shared across callers
+STATUS_CACHE_SECONDS = 1.0
+# 'generation' is bumped on invalidation so a payload built from older
+# statuses isn't stored over it
+_STATUS_CACHE = {'data': None, 'ts': 0.0, 'generation': 0}
+_STATUS_LOCK = threading.Lock()
+STATUS_BODY_CACHE_KEY = 'api_status_body'
 
-def update_eso_status_in_background():
+# Mixed into the dashboard page ETag so a restart (e.g. a deploy with a new
+# template) never revalidates a page rendered by the previous process
+_PAGE_ETAG_TOKEN = os.urandom(8).hex()
+
+# --- BACKGROUND SCHEDULER ---
+
+
+def _wait_for_scheduler(timeout):
     """
-    Background thread worker function to periodically update the ESO
-    status cache.
+    Delay function for SCHEDULER: sleeps until the next entry is due, but
+    returns early when a new entry is added so the queue is re-read.
     """
+    if SCHEDULER_WAKE_EVENT.wait(timeout):
+        SCHEDULER_WAKE_EVENT.clear()
+
+
+SCHEDULER = sched.scheduler(time.monotonic, _wait_for_scheduler)
 
-    try:
-        POLLING_INTERVAL_SECONDS = config.ESO_POLL_INTERVAL
-    except AttributeError:
-        POLLING_INTERVAL_SECONDS = 300
-        print(
-            "WARNING: ESO_POLL_INTERVAL not found in config. "
-            "Defaulting to 300 seconds."
-        )
 
-    while True:
-        try:
-            latest_status = eso_status_poller.fetch_eso_status()
-            ESO_STATUS_CACHE.update(latest_status)
-            print("ESO Status Cache Updated:", ESO_STATUS_CACHE)
+def schedule_job(job, delay, *args):
+    """
+    (Re)schedules job to run in delay seconds, replacing its pending run.
+    """
+    with SCHEDULE_LOCK:
+        pending = _SCHEDULED_JOBS.pop(job, None)
+        if pending is not None:
+            try:
+                SCHEDULER.cancel(pending)
+            except ValueError:
+                pass  # Already popped by the scheduler
+        if not SHUTDOWN_EVENT.is_set():
+            _SCHEDULED_JOBS[job] = SCHEDULER.enter(delay, 1, job, args)
+
+    SCHEDULER_WAKE_EVENT.set()
+
+
+def run_job_now(job):
+    """
+    Moves a pending job to the front of the queue. A job that is running
+    right now is left alone; it reschedules itself when it finishes.
+    """
+    with SCHEDULE_LOCK:
+        pending = _SCHEDULED_JOBS.get(job)
+
+    if pending is not None:
+        schedule_job(job, 0, *pending.argument)
+
+
+def update_eso_status(polling_interval_seconds):
+    """
+    Scheduled job that refreshes the ESO status cache and schedules the
+    next poll.
+    """
+    global ESO_STATUS_CACHE
+
+    try:
+        latest_status = eso_status_poller.fetch_eso_status()
+        ESO_STATUS_CACHE = {**ESO_STATUS_CACHE, **latest_status}
+        invalidate_status_cache()
+        logger.info("ESO Status Cache Updated: %s", ESO_STATUS_CACHE)
 
-            # Note: This ESO thread still triggers a full update every 60s
-            socketio.emit(
-                'status_update', get_dashboard_data_from_cache_or_poller())
+        emit_status_update()
 
-        except Exception as e:
-            print(f"ERROR during ESO status polling: {e}")
+    except Exception as e:
+        logger.error("ERROR during ESO status polling: %s", e)
 
-        time.sleep(POLLING_INTERVAL_SECONDS)
+    schedule_job(update_eso_status, polling_interval_seconds,
+                 polling_interval_seconds)
 
 
-def calendar_poller_in_background():
+def seconds_until_next_check(next_change_ts):
     """
-    Dedicated thread to schedule calendar updates based on event
-    transitions.
-    Eliminates the dependency on the ESO 60-second poll interval.
-    Uses a threading Event to wake up immediately on manual refresh.
+    Returns how long the calendar job should wait before re-checking,
+    based on the POSIX timestamp of the next scheduled event transition.
     """
-    MIN_SLEEP = 1  # Check every second for transitions
+    MIN_SLEEP = 1  # Re-check soon if a transition is due or overdue
     DEFAULT_SLEEP = 60  # Check every minute if nothing is scheduled
+    MAX_SLEEP = 3600  # Occasionally check for issues or very stale states
+
+    time_until_change = None
+    if next_change_ts is not None:
+        # Calculate time until the next scheduled change
+        time_until_change = next_change_ts - time.time()
+
+        # Wake exactly on the transition so clients see it on time
+        if time_until_change <= MAX_SLEEP:
+            return max(time_until_change, MIN_SLEEP)
+
+    sleep_time = DEFAULT_SLEEP if time_until_change is None else MAX_SLEEP
+
+    # Untimed checks get a little jitter so they don't land in the same
+    # instant as a burst of manual refreshes
+    sleep_time += random.uniform(0, min(10.0, sleep_time * 0.05))
+
+    # ...but never push a capped sleep past the transition itself
+    if time_until_change is not None:
+        sleep_time = min(sleep_time, time_until_change)
+
+    return sleep_time
+
+
+def update_calendar_status():
+    """
+    Scheduled job that pushes the current calendar statuses to clients and
+    schedules itself for the next event transition.
+    """
+    try:
+        # NOTE: check_status(force_fetch=False) will only hit the API once
+        # the cache has expired; manual refreshes update it directly.
+        CALENDAR_MANAGER.check_status(force_fetch=False)
+        invalidate_status_cache()
+
+        logger.info("CALENDAR WORKER: Pushing update.")
+        emit_status_update()
+
+        sleep_time = seconds_until_next_check(
+            CALENDAR_MANAGER.next_change_timestamp)
+
+    except Exception as e:
+        logger.error("ERROR during Calendar Poller worker: %s", e)
+        # If an error occurs, wait a minute before trying again
+        sleep_time = 60
 
-    while True:
-        try:
-            # 1. Check status and get the next scheduled transition time
-            # Note: We rely on the cache expiration logic inside the poller.
-            _, next_change_time = CALENDAR_MANAGER.check_status()
-
-            sleep_time = DEFAULT_SLEEP
-
-            if next_change_time:
-                # 2. Calculate time until the next scheduled change
-                now_utc = datetime.now(next_change_time.tzinfo)
-                time_until_change = (
-                    next_change_time - now_utc).total_seconds()
-
-                # If the change is in the past, or very soon, use MIN_SLEEP
-                if time_until_change <= 0:
-                    sleep_time = MIN_SLEEP
-                else:
-                    # Sleep until the event time, but not less than MIN_SLEEP
-                    # Add small buffer to wake up after target time?
-                    # Actually, waking up exactly on time or slightly before is
-                    # fine because we re-check.
-                    sleep_time = max(time_until_change, MIN_SLEEP)
-
-            # Cap the sleep time to ensure we occasionally check for issues
-            # or very stale states
-            sleep_time = min(sleep_time, 3600)
-
-            print(f"Calendar Poller scheduled for next check in "
-                  f"{sleep_time:.1f} s.")
-
-            # Wait for the calculated time OR until a manual wake-up event
-            # is triggered
-            woken_by_event = CALENDAR_WAKE_EVENT.wait(timeout=sleep_time)
-
-            if woken_by_event:
-                print("CALENDAR WORKER: Woken by manual refresh event!")
-                CALENDAR_WAKE_EVENT.clear()  # Reset the event
-
-            # 3. After sleeping (or waking), re-evaluate status.
-            # IMPORTANT: We use force_fetch=False. We trust the cache (which
-            # manual refresh updates).
-            # We only want to trigger a client update if the status *logic*
-            # dictates it (e.g. time passed).
-            # However, if we were woken by event, the cache is ALREADY updated
-            # by the finding thread.
-            # We just need to emit the status.
-
-            # If we just timed out naturally, we might need to emit a state
-            # change (e.g. pending -> busy).
-            # check_calendar_status returns current statuses.
-            # Effectively, every loop iteration pushes the current state to
-            # clients.
-
-            # NOTE: check_status(force_fetch=False) will only hit API if
-            # 12h expired.
-            CALENDAR_MANAGER.check_status(force_fetch=False)
-
-            print("CALENDAR WORKER: Pushing update.")
-            socketio.emit(
-                'status_update', get_dashboard_data_from_cache_or_poller())
-
-        except Exception as e:
-            print(f"ERROR during Calendar Poller worker: {e}")
-            # If an error occurs, wait a minute before trying again
-            time.sleep(60)
+    logger.info("Calendar Poller scheduled for next check in %.1f s.",
+                sleep_time)
+    schedule_job(update_calendar_status, sleep_time)
+
+
+def run_background_scheduler():
+    """
+    Background worker that runs both the ESO and calendar jobs from one
+    scheduler, sleeping until whichever is due first.
+    """
+    schedule_job(update_eso_status, 0, ESO_POLL_INTERVAL)
+    schedule_job(update_calendar_status, 0)
+
+    # Returns once stop_background_workers() empties the queue
+    SCHEDULER.run()
+
+
+def start_background_workers():
+    """
+    Starts the scheduler as a SocketIO background task. A green thread
+    under eventlet, so it interleaves with SocketIO emits instead of
+    blocking the hub. Call this once per process that should poll.
+    """
+    socketio.start_background_task(run_background_scheduler)
+
+
+@atexit.register
+def stop_background_workers():
+    """Empties the scheduler on interpreter exit so its loop can end."""
+    SHUTDOWN_EVENT.set()
+    with SCHEDULE_LOCK:
+        for entry in SCHEDULER.queue:
+            try:
+                SCHEDULER.cancel(entry)
+            except ValueError:
+                pass
+        _SCHEDULED_JOBS.clear()
+    SCHEDULER_WAKE_EVENT.set()
 
 
 # --- DATA RETRIEVAL ---
 
 
+def invalidate_status_cache():
+    """Forces the next payload request to re-read the latest statuses."""
+    with _STATUS_LOCK:
+        _STATUS_CACHE['data'] = None
+        _STATUS_CACHE['generation'] += 1
+    cache.delete(STATUS_BODY_CACHE_KEY)
+
+
 def get_dashboard_data_from_cache_or_poller():
+    """
+    Returns the dashboard payload, reusing the one built within the last
+    STATUS_CACHE_SECONDS so concurrent requests, socket handlers and
+    workers share a single status resolution. The result is shared and
+    must not be mutated.
+    """
+    with _STATUS_LOCK:
+        data = _STATUS_CACHE['data']
+        if (data is not None and
+                time.monotonic() - _STATUS_CACHE['ts'] < STATUS_CACHE_SECONDS):
+            return data
+        generation = _STATUS_CACHE['generation']
+
+    # Built without the lock: check_status may fetch from the API, and
+    # other callers should keep being served meanwhile
+    data = build_dashboard_data()
+
+    with _STATUS_LOCK:
+        if _STATUS_CACHE['generation'] == generation:
+            _STATUS_CACHE['data'] = data
+            _STATUS_CACHE['ts'] = time.monotonic()
+
+    return data
+
+
+def build_dashboard_data():
     """
     Retrieves the latest status data and prepares the final structure
     for client-side use.
@@ -152,49 +321,102 @@ def get_dashboard_data_from_cache_or_poller():
 
     calendar_data_tuple = CALENDAR_MANAGER.check_status()
 
-    # Collect all possible text labels from config to help client scale fonts
-    all_possible_texts = set()
-    for cal_config in config.CALENDAR_CONFIGS:
-        for status_info in cal_config.get('statuses', {}).values():
-            text = status_info.get('text', '')
-            if text:
-                all_possible_texts.add(text)
-    
-    # Add ESO names too
-    all_possible_texts.add(config.ESO_CONFIG.get('NA_DISPLAY_NAME', 'PC-NA'))
-    all_possible_texts.add(config.ESO_CONFIG.get('EU_DISPLAY_NAME', 'PC-EU'))
-
     data = {
         "eso_status": ESO_STATUS_CACHE,
         "calendar_statuses": calendar_data_tuple[0],
-        "all_possible_texts": list(all_possible_texts)
+        "all_possible_texts": _ALL_POSSIBLE_TEXTS
     }
 
-    data['eso_config'] = {
-        'NA_DISPLAY_NAME': config.ESO_CONFIG['NA_DISPLAY_NAME'],
-        'EU_DISPLAY_NAME': config.ESO_CONFIG['EU_DISPLAY_NAME'],
-    }
+    # Shared, never-mutated constants built at import
+    data['eso_config'] = _ESO_CONFIG_PAYLOAD
 
     return data
 
 
+def _payload_hash(data):
+    """Cheap fingerprint of the payload fields that change at runtime."""
+    return hash((
+        tuple(sorted(data['eso_status'].items())),
+        tuple(tuple(item.items()) for item in data['calendar_statuses']),
+    ))
+
+
+def emit_status_update():
+    """
+    Pushes the top-level payload fields that changed since the last push
+    to all clients. Nothing is emitted when the payload is unchanged.
+    """
+    global LAST_EMITTED_PAYLOAD, _LAST_EMIT_HASH
+
+    data = get_dashboard_data_from_cache_or_poller()
+    payload_hash = _payload_hash(data)
+
+    with EMIT_LOCK:
+        # Same statuses as last time: skip the per-field diff
+        if payload_hash == _LAST_EMIT_HASH:
+            return
+        _LAST_EMIT_HASH = payload_hash
+
+        changed = {
+            key: value for key, value in data.items()
+            if LAST_EMITTED_PAYLOAD.get(key) != value
+        }
+        if not changed:
+            return
+        # Payloads are never mutated, so keeping the reference is enough
+        LAST_EMITTED_PAYLOAD = data
+
+    # One emit to the namespace: the packet is encoded once and queued for
+    # every client, which doesn't block the sender under eventlet
+    socketio.emit('status_update', changed)
+
+
 # --- ROUTES ---
 
 
+def _orjson_response(obj):
+    """Serializes obj with orjson into a JSON response."""
+    return app.response_class(orjson.dumps(obj), mimetype='application/json')
+
+
 @app.route("/")
 def main_dashboard():
     """Main dashboard route to render the HTML template."""
     cache_data = get_dashboard_data_from_cache_or_poller()
-    return render_template('dashboard.html',
-                           cache=cache_data,
-                           calendar_configs=config.CALENDAR_CONFIGS)
+    etag = hashlib.md5(
+        _PAGE_ETAG_TOKEN.encode() + orjson.dumps(cache_data)).hexdigest()
+
+    # Answer revalidation before spending time rendering the template
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(render_template(
+            'dashboard.html',
+            cache=cache_data,
+            calendar_configs=config.CALENDAR_CONFIGS))
+
+    response.set_etag(etag)
+    return response
+
+
+@cache.cached(timeout=1, key_prefix=STATUS_BODY_CACHE_KEY)
+def get_status_body():
+    """
+    Returns the serialized /api/status body and its ETag, shared by all
+    pollers for up to a second.
+    """
+    body = orjson.dumps(get_dashboard_data_from_cache_or_poller())
+    return body, hashlib.md5(body).hexdigest()
 
 
 @app.route("/api/status")
 def api_status():
     """API endpoint for dashboard.js to fetch status updates."""
-    data = get_dashboard_data_from_cache_or_poller()
-    return jsonify(data)
+    body, etag = get_status_body()
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Turns the response into a 304 when If-None-Match already matches
+    return response.make_conditional(request)
 
 
 @app.route("/api/refresh_calendar", methods=['POST'])
@@ -202,34 +424,42 @@ def api_refresh_calendar():
     """Endpoint for manual calendar refresh trigger with rate limiting."""
     global LAST_MANUAL_REFRESH_TIME
 
-    current_time = datetime.now()
-
-    time_since_last_refresh = (
-        current_time - LAST_MANUAL_REFRESH_TIME).total_seconds()
     cooldown = config.CALENDAR_MIN_REFRESH_INTERVAL
 
-    if time_since_last_refresh < cooldown:
-        remaining_wait = int(cooldown - time_since_last_refresh)
+    # Check and claim the slot atomically so concurrent POSTs can't both
+    # pass the cooldown
+    with REFRESH_LOCK:
+        current_time = time.monotonic()
+        time_since_last_refresh = current_time - LAST_MANUAL_REFRESH_TIME
+
+        if time_since_last_refresh < cooldown:
+            remaining_wait = int(cooldown - time_since_last_refresh)
+        else:
+            remaining_wait = None
+            LAST_MANUAL_REFRESH_TIME = current_time
+
+    if remaining_wait is not None:
         message = (
             f"Please wait {remaining_wait} more seconds before "
             "refreshing again."
         )
-        print(f"RATE LIMIT EXCEEDED: {message}")
-        return jsonify({"success": False, "message": message}), 429
+        logger.warning("RATE LIMIT EXCEEDED: %s", message)
+        return _orjson_response({"success": False, "message": message}), 429
 
-    LAST_MANUAL_REFRESH_TIME = current_time
-
-    # Force the calendar poller to fetch new data from Google Calendar API
+    # Force the calendar manager to fetch new data from Google Calendar API
     CALENDAR_MANAGER.check_status(force_fetch=True)
+    invalidate_status_cache()
 
     # Notify all clients to fetch the newly updated cache data
-    socketio.emit('status_update', get_dashboard_data_from_cache_or_poller())
+    emit_status_update()
+
+    # Run the calendar job now so it re-schedules based on the new data
+    run_job_now(update_calendar_status)
 
-    # Wake up the background thread so it can immediately re-schedule based
-    # on new data
-    CALENDAR_WAKE_EVENT.set()
+    # Also re-poll ESO now rather than at the end of its interval
+    run_job_now(update_eso_status)
 
-    return jsonify({
+    return _orjson_response({
         "success": True,
         "message": "Refresh request accepted and data update triggered."
     })
@@ -240,23 +470,20 @@ def api_refresh_calendar():
 
 @socketio.on('connect')
 def handle_connect():
-    print('Client connected:', request.sid)
-    socketio.emit('status_update', get_dashboard_data_from_cache_or_poller())
+    logger.info('Client connected: %s', request.sid)
+    # The new client needs the full state, not a diff
+    socketio.emit(
+        'status_update', get_dashboard_data_from_cache_or_poller(),
+        to=request.sid)
 
 
 # --- MAIN RUN BLOCK ---
 
 
 if __name__ == '__main__':
-    # 1. START THE BACKGROUND POLLER THREAD for ESO (still needed for ESO)
-    eso_thread = threading.Thread(
-        target=update_eso_status_in_background, daemon=True)
-    eso_thread.start()
-
-    # 2. START THE BACKGROUND POLLER THREAD for CALENDAR
-    calendar_thread = threading.Thread(
-        target=calendar_poller_in_background, daemon=True)
-    calendar_thread.start()
-
-    # 3. Start the web server
-    socketio.run(app, debug=True, allow_unsafe_werkzeug=True, host='0.0.0.0', port=5000)
+    # Development entry point; production runs wsgi.py under Gunicorn.
+    # 1. START THE BACKGROUND POLLER TASKS for ESO and CALENDAR
+    start_background_workers()
+
+    # 2. Start the web server (eventlet WSGI server, no debug reloader)
+    socketio.run(app, debug=False, host='0.0.0.0', port=5000)
@@ -1,5 +1,8 @@
 import requests
 import json
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 # from datetime import datetime  # TODO: Remove if not used
 
 # --- Configuration ---
@@ -18,6 +21,29 @@ TARGET_SERVERS = [
     "The Elder Scrolls Online (NA)",
     "The Elder Scrolls Online (EU)"
 ]
+
+# Dashboard display key for each target server (e.g., "NA" or "EU"),
+# stripping the "The Elder Scrolls Online ()" part once at import
+TARGET_SERVERS_MAP = {
+    server_key: server_key.replace("The Elder Scrolls Online", "").strip()
+    .replace("(", "").replace(")", "").strip().upper()
+    for server_key in TARGET_SERVERS
+}
+
+# Shared session so successive polls reuse the TCP/TLS connection
+_SESSION = requests.Session()
+_SESSION.headers.update({
+    'User-Agent': CHROME_USER_AGENT,
+    'Accept': 'application/json',
+})
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=2,
+    pool_maxsize=2,
+    # raise_on_status=False hands the final 5xx back to raise_for_status()
+    max_retries=Retry(
+        total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504],
+        raise_on_status=False)
+))
 # ---------------------
 
 
@@ -27,22 +53,17 @@ def fetch_eso_status():
     navigates the nested JSON, and returns the status for PC NA and PC EU.
     """
     try:
-        # 1. Prepare Headers with Spoofed User-Agent
-        headers = {
-            'User-Agent': CHROME_USER_AGENT,
-            'Accept': 'application/json',
-        }
-
-        # 2. Make the HTTP GET Request
-        response = requests.get(ESO_API_URL, headers=headers, timeout=10)
+        # 1. Make the HTTP GET Request (session sends the spoofed
+        # User-Agent headers)
+        response = _SESSION.get(ESO_API_URL, timeout=10)
 
         # Raise an exception for bad status codes (4xx or 5xx)
         response.raise_for_status()
 
-        # 3. Parse the JSON Response
-        data = response.json()
+        # 2. Parse the JSON Response
+        data = orjson.loads(response.content)
 
-        # 4. Navigate the Nested Structure
+        # 3. Navigate the Nested Structure
         server_status = {}
 
         # Navigate to the 'response' dictionary which holds the
@@ -59,23 +80,13 @@ def fetch_eso_status():
                            "not found."
             }
 
-        # 5. Extract and Format Relevant Data
-        for server_key in TARGET_SERVERS:
+        # 4. Extract and Format Relevant Data
+        for server_key, display_key in TARGET_SERVERS_MAP.items():
 
             if server_key in realms:
                 # The status is the VALUE (a string, e.g., "UP")
                 # associated with the key
-                status = realms[server_key].upper()
-
-                # Format the key for cleaner dashboard display (e.g., "NA"
-                # or "EU")
-                # Strips the "The Elder Scrolls Online ()" part
-                display_key = server_key.replace(
-                    "The Elder Scrolls Online", "").strip()
-                display_key = display_key.replace(
-                    "(", "").replace(")", "").strip()
-
-                server_status[display_key.upper()] = status
+                server_status[display_key] = realms[server_key].upper()
             else:
                 server_status[server_key.upper()] = "SERVER KEY NOT FOUND"
 
@@ -90,7 +101,7 @@ def fetch_eso_status():
     except requests.exceptions.RequestException:
         # Handles network issues, timeouts, etc.
         return {"STATUS": "NETWORK ERROR", "MESSAGE": "Connection Issue"}
-    except json.JSONDecodeError:
+    except (json.JSONDecodeError, orjson.JSONDecodeError):
         # Handles cases where the response is not valid JSON
         return {"STATUS": "JSON ERROR", "MESSAGE": "Invalid JSON response"}
 
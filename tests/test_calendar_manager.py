@@ -1,27 +1,34 @@
 import unittest
-from datetime import datetime, timedelta
+from unittest import mock
+from datetime import datetime, timedelta, timezone
 import sys
 import os
-import pytz
 
-# Add parent directory to path to import calendar_poller
+# Add parent directory to path to import the calendar modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from calendar_event import CalendarEvent  # noqa: E402
-from calendar_manager import CalendarManager  # noqa: E402
+from config import CalConfig  # noqa: E402
+from calendar_event import CalendarEvent, to_epoch_us  # noqa: E402
+from googleapiclient.errors import HttpError  # noqa: E402
+from calendar_manager import (  # noqa: E402
+    CalendarManager, _resolve_loop, _resolve_vectorized, _resolve_kernel)
+
+
+UTC = timezone.utc
+# Reference time: 20:00 UTC
+NOW_UTC = datetime(2023, 10, 27, 20, 0, 0, tzinfo=UTC)
 
 
 class TestCalendarPollerOOP(unittest.TestCase):
 
     def setUp(self):
-        self.utc = pytz.utc
-        # Reference time: 20:00 UTC
-        self.now_utc = datetime(2023, 10, 27, 20, 0, 0, tzinfo=self.utc)
         self.pending_delta = timedelta(minutes=15)
         self.prepare_delta = timedelta(minutes=60)
 
-        # Helper to create an event dict
-        self.create_event_data = lambda start, end: {
+    @staticmethod
+    def _event(start, end):
+        """Helper to create an event dict."""
+        return {
             'start': {'dateTime': start.isoformat()},
             'end': {'dateTime': end.isoformat()}
         }
@@ -30,24 +37,40 @@ class TestCalendarPollerOOP(unittest.TestCase):
 
     def test_event_validity(self):
         # Good event
-        data = self.create_event_data(
-            self.now_utc, self.now_utc + timedelta(hours=1))
-        event = CalendarEvent(data, self.utc)
+        data = self._event(
+            NOW_UTC, NOW_UTC + timedelta(hours=1))
+        event = CalendarEvent(data, UTC)
         self.assertTrue(event.is_valid)
-        self.assertEqual(event.start, self.now_utc)
+        self.assertEqual(event.start, NOW_UTC)
 
         # Bad event
-        event = CalendarEvent({}, self.utc)
+        event = CalendarEvent({}, UTC)
         self.assertFalse(event.is_valid)
 
+    def test_event_offsets_normalized_to_comparison_timezone(self):
+        data = {
+            'start': {'dateTime': '2023-10-27T13:00:00-07:00'},
+            'end': {'dateTime': '2023-10-27T21:00:00Z'}
+        }
+        event = CalendarEvent(data, UTC)
+        self.assertEqual(event.start, NOW_UTC)
+        self.assertEqual(event.end, NOW_UTC + timedelta(hours=1))
+        self.assertEqual(event.start.utcoffset(), timedelta(0))
+
+        # Same result from the stdlib parser used without ciso8601
+        with mock.patch('calendar_event.ciso8601', None):
+            fallback = CalendarEvent(data, UTC)
+        self.assertEqual(
+            (fallback.start, fallback.end), (event.start, event.end))
+
     def test_status_busy(self):
         # Event: 19:30 - 20:30 (Contains 20:00)
-        start = self.now_utc - timedelta(minutes=30)
-        end = self.now_utc + timedelta(minutes=30)
+        start = NOW_UTC - timedelta(minutes=30)
+        end = NOW_UTC + timedelta(minutes=30)
 
-        event = CalendarEvent(self.create_event_data(start, end), self.utc)
+        event = CalendarEvent(self._event(start, end), UTC)
         status, transition = event.get_status(
-            self.now_utc, self.pending_delta, self.prepare_delta,
+            NOW_UTC, self.pending_delta, self.prepare_delta,
             has_prepare_status=True
         )
         self.assertEqual(status, "BUSY")
@@ -56,12 +79,12 @@ class TestCalendarPollerOOP(unittest.TestCase):
     def test_status_pending(self):
         # Event starts at 20:10 (10 mins from now).
         # Pending window 15m (Starts 19:45).
-        start = self.now_utc + timedelta(minutes=10)
-        end = self.now_utc + timedelta(minutes=70)
+        start = NOW_UTC + timedelta(minutes=10)
+        end = NOW_UTC + timedelta(minutes=70)
 
-        event = CalendarEvent(self.create_event_data(start, end), self.utc)
+        event = CalendarEvent(self._event(start, end), UTC)
         status, transition = event.get_status(
-            self.now_utc, self.pending_delta, self.prepare_delta,
+            NOW_UTC, self.pending_delta, self.prepare_delta,
             has_prepare_status=True
         )
         self.assertEqual(status, "PENDING")
@@ -70,12 +93,12 @@ class TestCalendarPollerOOP(unittest.TestCase):
     def test_status_prepare(self):
         # Event starts at 20:45. Prepare window 60m (Starts 19:45).
         # Now is 20:00.
-        start = self.now_utc + timedelta(minutes=45)
-        end = self.now_utc + timedelta(hours=2)
+        start = NOW_UTC + timedelta(minutes=45)
+        end = NOW_UTC + timedelta(hours=2)
 
-        event = CalendarEvent(self.create_event_data(start, end), self.utc)
+        event = CalendarEvent(self._event(start, end), UTC)
         status, transition = event.get_status(
-            self.now_utc, self.pending_delta, self.prepare_delta,
+            NOW_UTC, self.pending_delta, self.prepare_delta,
             has_prepare_status=True
         )
         self.assertEqual(status, "PREPARE")
@@ -84,33 +107,34 @@ class TestCalendarPollerOOP(unittest.TestCase):
     # --- CalendarManager Tests ---
 
     def test_manager_resolve_status_priority_busy_overrides_pending(self):
-        # Mocking a manager instance partly
-        # No config needed for _resolve_status_for_calendar logic check
-        manager = CalendarManager([])
-
         # Config item
-        config_item = {
-            'statuses': {'BUSY': {}, 'PENDING': {}, 'PREPARE': {}},
-            'pending_minutes': 15,
-            'prepare_minutes': 60
-        }
+        config_item = CalConfig(
+            id='test_cal',
+            calendar_id='test_cal',
+            name='Test Calendar',
+            statuses={'BUSY': {}, 'PENDING': {}, 'PREPARE': {}},
+            pending_minutes=15,
+            prepare_minutes=60
+        )
+        manager = CalendarManager([config_item])
 
         # Events
         events = [
             # BUSY
-            self.create_event_data(
-                self.now_utc - timedelta(minutes=30),
-                self.now_utc + timedelta(minutes=30)
+            self._event(
+                NOW_UTC - timedelta(minutes=30),
+                NOW_UTC + timedelta(minutes=30)
             ),
             # PENDING
-            self.create_event_data(
-                self.now_utc + timedelta(minutes=10),
-                self.now_utc + timedelta(minutes=70)
+            self._event(
+                NOW_UTC + timedelta(minutes=10),
+                NOW_UTC + timedelta(minutes=70)
             )
         ]
 
-        cal_status, next_change, _ = manager._resolve_status_for_calendar(
-            "test_cal", events, config_item, self.now_utc
+        cal_status, next_change = manager._resolve_status_for_calendar(
+            "test_cal", manager._parse_events(events), config_item,
+            NOW_UTC
         )
 
         self.assertEqual(cal_status, "BUSY")
@@ -119,35 +143,261 @@ class TestCalendarPollerOOP(unittest.TestCase):
         # BUSY ends 20:30.
         # PENDING starts (actually, transitions to BUSY) at 20:10.
         # So next change is 20:10.
-        expected_change = self.now_utc + timedelta(minutes=10)
+        expected_change = NOW_UTC + timedelta(minutes=10)
         self.assertEqual(next_change, expected_change)
 
     def test_manager_resolve_status_prepare_vs_free(self):
-        manager = CalendarManager([])
-        config_item = {
-            'statuses': {'BUSY': {}, 'PENDING': {}, 'PREPARE': {}},
-            'pending_minutes': 15,
-            'prepare_minutes': 60
-        }
+        config_item = CalConfig(
+            id='test_cal',
+            calendar_id='test_cal',
+            name='Test Calendar',
+            statuses={'BUSY': {}, 'PENDING': {}, 'PREPARE': {}},
+            pending_minutes=15,
+            prepare_minutes=60
+        )
+        manager = CalendarManager([config_item])
 
         # Event is Prepare (Starts 20:45)
         events = [
-            self.create_event_data(
-                self.now_utc + timedelta(minutes=45),
-                self.now_utc + timedelta(hours=2)
+            self._event(
+                NOW_UTC + timedelta(minutes=45),
+                NOW_UTC + timedelta(hours=2)
             )
         ]
 
-        cal_status, next_change, _ = manager._resolve_status_for_calendar(
-            "test_cal", events, config_item, self.now_utc
+        cal_status, next_change = manager._resolve_status_for_calendar(
+            "test_cal", manager._parse_events(events), config_item,
+            NOW_UTC
         )
 
         self.assertEqual(cal_status, "PREPARE")
 
         # Next change is when PREPARE ends/PENDING starts: Start - 15m = 20:30
-        expected_change = self.now_utc + timedelta(minutes=30)
+        expected_change = NOW_UTC + timedelta(minutes=30)
         self.assertEqual(next_change, expected_change)
 
+    def test_manager_parse_events_skips_all_day(self):
+        manager = CalendarManager([])
+        events = [
+            {'start': {'date': '2023-10-27'}, 'end': {'date': '2023-10-28'}},
+            self._event(
+                NOW_UTC, NOW_UTC + timedelta(hours=1)),
+        ]
+
+        parsed = manager._parse_events(events)
+
+        self.assertEqual(len(parsed['meta']), 1)
+        self.assertEqual(parsed['starts'].dtype, 'int64')
+        self.assertEqual(
+            parsed['ends'][0] - parsed['starts'][0], 3600 * 1_000_000)
+
+    def test_manager_parse_events_reuses_unchanged_events(self):
+        manager = CalendarManager([])
+        data = self._event(
+            NOW_UTC, NOW_UTC + timedelta(hours=1))
+        data.update({'id': 'evt1', 'updated': '2023-10-27T00:00:00Z'})
+
+        event_objs = {}
+        manager._parse_events([data], event_objs)
+        manager._event_obj_cache = event_objs
+
+        reused = {}
+        manager._parse_events([dict(data)], reused)
+        self.assertIs(
+            reused[('evt1', data['updated'])],
+            event_objs[('evt1', data['updated'])])
+
+        changed = dict(data, updated='2023-10-27T01:00:00Z')
+        fresh = {}
+        manager._parse_events([changed], fresh)
+        self.assertNotIn(('evt1', data['updated']), fresh)
+
+    def test_resolve_kernels_agree(self):
+        manager = CalendarManager([])
+        minute = timedelta(minutes=1)
+        events = manager._parse_events([
+            self._event(
+                NOW_UTC - 90 * minute, NOW_UTC - 60 * minute),
+            self._event(
+                NOW_UTC + 45 * minute, NOW_UTC + 120 * minute),
+            self._event(
+                NOW_UTC + 300 * minute, NOW_UTC + 360 * minute),
+        ])
+        now_us = to_epoch_us(NOW_UTC)
+
+        # The compiled kernel is what production runs when Numba is present
+        kernels = [_resolve_vectorized]
+        if _resolve_kernel is not None:
+            kernels.append(_resolve_kernel)
+
+        for has_prepare in (True, False):
+            args = (
+                events['starts'], events['ends'], now_us,
+                15 * 60 * 1_000_000, 60 * 60 * 1_000_000, has_prepare
+            )
+            for kernel in kernels:
+                self.assertEqual(_resolve_loop(*args), kernel(*args))
+
+    def test_manager_check_status_uses_configured_details(self):
+        config_item = CalConfig(
+            id='test_cal',
+            calendar_id='test_cal',
+            name='Test Calendar',
+            pending_minutes=15,
+            statuses={
+                'FREE': {'class': 'status-green', 'text': 'FREE'},
+                'BUSY': {'class': 'status-red', 'text': 'BUSY'},
+                'ERROR': {'class': 'status-orange', 'text': 'ERROR'},
+            }
+        )
+        manager = CalendarManager([config_item])
+
+        now_utc = datetime.now(timezone.utc)
+        manager._last_cache_update = now_utc
+        manager._local_event_cache = {
+            'test_cal': manager._parse_events([
+                self._event(
+                    now_utc - timedelta(minutes=5),
+                    now_utc + timedelta(minutes=30))
+            ])
+        }
+
+        statuses, next_change = manager.check_status()
+
+        self.assertEqual(statuses, [{
+            'id': 'test_cal',
+            'name': 'Test Calendar',
+            'status': 'BUSY',
+            'css_class': 'status-red',
+            'display_text': 'BUSY',
+        }])
+        self.assertGreater(next_change, now_utc)
+        self.assertEqual(
+            manager.next_change_timestamp, next_change.timestamp())
+
+        # A cache hit returns the same scheduling time
+        self.assertEqual(manager.check_status(), (statuses, next_change))
+
+    def test_manager_cache_hit_keeps_no_next_change(self):
+        config_item = CalConfig(
+            id='test_cal', calendar_id='test_cal', name='Test', statuses={})
+        manager = CalendarManager([config_item])
+        manager._last_cache_update = datetime.now(timezone.utc)
+
+        self.assertIsNone(manager.check_status()[1])
+        self.assertIsNone(manager.check_status()[1])
+        self.assertIsNone(manager.next_change_timestamp)
+
+    def _fake_service(self, list_responses):
+        """Service whose events().list(...) returns list_responses(kwargs)."""
+        service = mock.MagicMock()
+
+        def list_events(**kwargs):
+            request = mock.Mock()
+            request.execute.side_effect = (
+                lambda http=None: list_responses(kwargs))
+            return request
+
+        service.events.return_value.list.side_effect = list_events
+        return service
+
+    def _fetch(self, manager, service):
+        with mock.patch('calendar_manager.get_google_credentials'), \
+                mock.patch('calendar_manager.get_google_service',
+                           return_value=service):
+            manager._fetch_from_api()
+
+    def test_manager_fetch_populates_each_calendar(self):
+        configs = [
+            CalConfig(id='a', calendar_id='cal-a', name='A',
+                      statuses={'FREE': {}, 'BUSY': {}}),
+            CalConfig(id='b', calendar_id='cal-b', name='B',
+                      statuses={'FREE': {}, 'BUSY': {}}),
+        ]
+        manager = CalendarManager(configs)
+        event = self._event(
+            NOW_UTC, NOW_UTC + timedelta(hours=1))
+        event['id'] = 'evt1'
+        items_by_calendar = {'cal-a': [event], 'cal-b': []}
+
+        self._fetch(manager, self._fake_service(
+            lambda kwargs: {'items': items_by_calendar[kwargs['calendarId']]}
+        ))
+
+        self.assertEqual(len(manager._local_event_cache['a']['meta']), 1)
+        self.assertEqual(len(manager._local_event_cache['b']['meta']), 0)
+
+    def test_manager_fetch_applies_incremental_sync(self):
+        configs = [CalConfig(id='a', calendar_id='cal-a', name='A',
+                             statuses={'FREE': {}, 'BUSY': {}})]
+        manager = CalendarManager(configs)
+        now_utc = datetime.now(timezone.utc)
+
+        def event(event_id, hours):
+            data = self._event(
+                now_utc + timedelta(hours=hours),
+                now_utc + timedelta(hours=hours + 1))
+            data['id'] = event_id
+            return data
+
+        self._fetch(manager, self._fake_service(lambda kwargs: {
+            'items': [event('keep', 1), event('drop', 2)],
+            'nextSyncToken': 'token-1'
+        }))
+
+        requests_seen = []
+
+        def delta(kwargs):
+            requests_seen.append(kwargs)
+            return {
+                'items': [
+                    {'id': 'drop', 'status': 'cancelled'},
+                    event('new', 3),
+                ],
+                'nextSyncToken': 'token-2'
+            }
+
+        self._fetch(manager, self._fake_service(delta))
+
+        self.assertEqual(requests_seen[0]['syncToken'], 'token-1')
+        self.assertNotIn('timeMin', requests_seen[0])
+        self.assertEqual(
+            [e['id'] for e in manager._local_event_cache['a']['meta']],
+            ['keep', 'new'])
+        self.assertEqual(manager._sync_state['a']['token'], 'token-2')
+
+    def test_manager_fetch_falls_back_to_full_window_on_expired_token(self):
+        configs = [CalConfig(id='a', calendar_id='cal-a', name='A',
+                             statuses={'FREE': {}, 'BUSY': {}})]
+        manager = CalendarManager(configs)
+        manager._sync_state = {'a': {
+            'events': {},
+            'token': 'stale',
+            'window_end': datetime.now(timezone.utc) + timedelta(hours=48)
+        }}
+
+        def list_responses(kwargs):
+            if 'syncToken' in kwargs:
+                raise HttpError(mock.Mock(status=410), b'')
+            return {'items': [], 'nextSyncToken': 'fresh'}
+
+        self._fetch(manager, self._fake_service(list_responses))
+
+        self.assertEqual(manager._sync_state['a']['token'], 'fresh')
+
+    def test_manager_skips_fetch_while_one_is_in_progress(self):
+        manager = CalendarManager([])
+
+        with mock.patch.object(manager, '_fetch_from_api') as fetch:
+            manager._fetch_in_progress = True
+            manager.check_status(force_fetch=True)
+            fetch.assert_not_called()
+
+            manager._fetch_in_progress = False
+            manager.check_status(force_fetch=True)
+            fetch.assert_called_once()
+            self.assertFalse(manager._fetch_in_progress)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,334 @@
+import atexit
+import threading
+import unittest
+from unittest import mock
+import sys
+import os
+
+# Add parent directory to path to import the dashboard modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dashboard_server  # noqa: E402
+
+# The listener's stderr handler is bound to the stream pytest captures at
+# import; stop it so queued records aren't written after that stream closes.
+dashboard_server.LOG_LISTENER.stop()
+atexit.unregister(dashboard_server.LOG_LISTENER.stop)
+
+
+class TestCalendarScheduling(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('dashboard_server.time.time', return_value=1000.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_wakes_exactly_on_transition(self):
+        self.assertEqual(
+            dashboard_server.seconds_until_next_check(1000.0 + 1800), 1800)
+
+    def test_overdue_transition_rechecks_after_min_sleep(self):
+        self.assertEqual(dashboard_server.seconds_until_next_check(990.0), 1)
+
+    def test_untimed_check_is_jittered(self):
+        with mock.patch('dashboard_server.random.uniform', return_value=2.5):
+            self.assertEqual(
+                dashboard_server.seconds_until_next_check(None), 62.5)
+
+    def test_capped_sleep_jitter_stops_at_transition(self):
+        with mock.patch('dashboard_server.random.uniform', return_value=8.0):
+            self.assertEqual(
+                dashboard_server.seconds_until_next_check(1000.0 + 3605),
+                3605)
+            self.assertEqual(
+                dashboard_server.seconds_until_next_check(1000.0 + 9000),
+                3608)
+
+
+class TestBackgroundScheduler(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('dashboard_server.emit_status_update')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        # Drain anything a test left queued, then allow scheduling again
+        dashboard_server.stop_background_workers()
+        dashboard_server.SHUTDOWN_EVENT.clear()
+        dashboard_server.SCHEDULER_WAKE_EVENT.clear()
+
+    @staticmethod
+    def _pending(job):
+        return dashboard_server._SCHEDULED_JOBS.get(job)
+
+    def test_eso_job_reschedules_itself_after_interval(self):
+        with mock.patch('dashboard_server.eso_status_poller.fetch_eso_status',
+                        return_value={'PC NA': 'UP'}):
+            before = dashboard_server.time.monotonic()
+            dashboard_server.update_eso_status(300)
+
+        self.assertEqual(dashboard_server.ESO_STATUS_CACHE['PC NA'], 'UP')
+        entry = self._pending(dashboard_server.update_eso_status)
+        self.assertEqual(entry.argument, (300,))
+        self.assertGreaterEqual(entry.time, before + 300)
+
+    def test_calendar_job_reschedules_on_next_transition(self):
+        manager = dashboard_server.CALENDAR_MANAGER
+        with mock.patch.object(manager, 'check_status'), \
+                mock.patch.object(
+                    type(manager), 'next_change_timestamp',
+                    new_callable=mock.PropertyMock, return_value=1120.0), \
+                mock.patch('dashboard_server.time.time', return_value=1000.0):
+            before = dashboard_server.time.monotonic()
+            dashboard_server.update_calendar_status()
+
+        entry = self._pending(dashboard_server.update_calendar_status)
+        self.assertAlmostEqual(entry.time - before, 120, delta=1)
+
+    def test_run_job_now_moves_pending_entry_to_front(self):
+        job = mock.Mock()
+        dashboard_server.schedule_job(job, 600, 'arg')
+        dashboard_server.run_job_now(job)
+
+        # The old entry is replaced, not duplicated
+        queued = [e for e in dashboard_server.SCHEDULER.queue
+                  if e.action is job]
+        self.assertEqual(queued, [self._pending(job)])
+        self.assertLessEqual(
+            queued[0].time, dashboard_server.time.monotonic())
+        self.assertEqual(queued[0].argument, ('arg',))
+
+    def test_run_job_now_leaves_unscheduled_job_alone(self):
+        job = mock.Mock()
+        dashboard_server.run_job_now(job)
+        self.assertIsNone(self._pending(job))
+
+    def test_new_entry_wakes_scheduler_and_shutdown_ends_run(self):
+        ran = threading.Event()
+        idle = mock.Mock()
+        dashboard_server.schedule_job(idle, 3600)
+
+        runner = threading.Thread(target=dashboard_server.SCHEDULER.run)
+        runner.start()
+
+        # Added while run() is waiting on the hour-long entry
+        dashboard_server.schedule_job(ran.set, 0)
+        self.assertTrue(ran.wait(2))
+        idle.assert_not_called()
+
+        dashboard_server.stop_background_workers()
+        runner.join(2)
+        self.assertFalse(runner.is_alive())
+        self.assertTrue(dashboard_server.SCHEDULER.empty())
+
+        # Nothing can be queued once shutdown has started
+        dashboard_server.schedule_job(idle, 0)
+        self.assertTrue(dashboard_server.SCHEDULER.empty())
+
+
+class TestDashboardPage(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(
+            dashboard_server.CALENDAR_MANAGER, 'check_status',
+            return_value=([], None))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(dashboard_server.invalidate_status_cache)
+        dashboard_server.invalidate_status_cache()
+        self.client = dashboard_server.app.test_client()
+
+    def test_matching_etag_returns_not_modified(self):
+        page = self.client.get('/')
+        self.assertEqual(page.status_code, 200)
+
+        revalidated = self.client.get(
+            '/', headers={'If-None-Match': page.headers['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.data, b'')
+
+    def test_etag_changes_with_process_token(self):
+        etag = self.client.get('/').headers['ETag']
+        with mock.patch('dashboard_server._PAGE_ETAG_TOKEN', 'restarted'):
+            page = self.client.get('/', headers={'If-None-Match': etag})
+        self.assertEqual(page.status_code, 200)
+        self.assertNotEqual(page.headers['ETag'], etag)
+
+
+def _calendar_statuses(status):
+    return [{
+        'id': 'primary',
+        'name': 'Primary Calendar',
+        'status': status,
+        'css_class': '',
+        'display_text': status,
+    }]
+
+
+class TestPayloadCache(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(
+            dashboard_server.CALENDAR_MANAGER, 'check_status')
+        self.check_status = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(dashboard_server.invalidate_status_cache)
+        dashboard_server.invalidate_status_cache()
+
+    def test_payload_invalidated_mid_build_is_not_cached(self):
+        stale = _calendar_statuses('FREE')
+        fresh = _calendar_statuses('BUSY')
+
+        def invalidated_during_build(force_fetch=False):
+            # e.g. an ESO poll landing while the statuses are resolved
+            self.check_status.side_effect = None
+            self.check_status.return_value = (fresh, None)
+            dashboard_server.invalidate_status_cache()
+            return stale, None
+
+        self.check_status.side_effect = invalidated_during_build
+
+        data = dashboard_server.get_dashboard_data_from_cache_or_poller()
+        self.assertEqual(data['calendar_statuses'], stale)
+        self.assertIsNone(dashboard_server._STATUS_CACHE['data'])
+
+        # The next call rebuilds, and that result is cached
+        data = dashboard_server.get_dashboard_data_from_cache_or_poller()
+        self.assertEqual(data['calendar_statuses'], fresh)
+        self.assertIs(
+            dashboard_server.get_dashboard_data_from_cache_or_poller(), data)
+        self.assertEqual(self.check_status.call_count, 2)
+
+
+class TestStatusApi(unittest.TestCase):
+
+    def setUp(self):
+        patchers = [
+            mock.patch('dashboard_server.ESO_STATUS_CACHE',
+                       {'PC NA': 'UP', 'PC EU': 'UP'}),
+            mock.patch.object(dashboard_server.CALENDAR_MANAGER,
+                              'check_status', return_value=([], None)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(dashboard_server.invalidate_status_cache)
+        dashboard_server.invalidate_status_cache()
+        self.client = dashboard_server.app.test_client()
+
+    def test_matching_etag_returns_not_modified(self):
+        status = self.client.get('/api/status')
+        self.assertEqual(status.status_code, 200)
+        self.assertEqual(status.json['eso_status']['PC NA'], 'UP')
+
+        revalidated = self.client.get(
+            '/api/status', headers={'If-None-Match': status.headers['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.data, b'')
+
+    def test_invalidation_drops_cached_body(self):
+        etag = self.client.get('/api/status').headers['ETag']
+
+        dashboard_server.ESO_STATUS_CACHE = {'PC NA': 'DOWN', 'PC EU': 'UP'}
+        dashboard_server.invalidate_status_cache()
+
+        status = self.client.get(
+            '/api/status', headers={'If-None-Match': etag})
+        self.assertEqual(status.status_code, 200)
+        self.assertNotEqual(status.headers['ETag'], etag)
+        self.assertEqual(status.json['eso_status']['PC NA'], 'DOWN')
+
+
+class TestStatusPush(unittest.TestCase):
+
+    def setUp(self):
+        patchers = [
+            mock.patch('dashboard_server.LAST_EMITTED_PAYLOAD', {}),
+            mock.patch('dashboard_server._LAST_EMIT_HASH', None),
+            mock.patch('dashboard_server.ESO_STATUS_CACHE',
+                       {'PC NA': 'UP', 'PC EU': 'UP'}),
+            mock.patch.object(dashboard_server.CALENDAR_MANAGER,
+                              'check_status'),
+            mock.patch.object(dashboard_server.socketio, 'emit'),
+        ]
+        mocks = [patcher.start() for patcher in patchers]
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+        self.addCleanup(dashboard_server.invalidate_status_cache)
+        self.check_status, self.emit = mocks[-2:]
+
+    def _push(self, status):
+        """Runs a worker-style push with the calendar reporting status."""
+        self.check_status.return_value = (_calendar_statuses(status), None)
+        dashboard_server.invalidate_status_cache()
+        dashboard_server.emit_status_update()
+
+    def _pushed(self):
+        """Payloads emitted so far, clearing the recorded calls."""
+        payloads = [c.args[1] for c in self.emit.call_args_list]
+        self.emit.reset_mock()
+        return payloads
+
+    def test_first_push_sends_full_payload(self):
+        self._push('FREE')
+
+        self.emit.assert_called_once_with(
+            'status_update',
+            dashboard_server.get_dashboard_data_from_cache_or_poller())
+        self.assertEqual(
+            set(self._pushed()[0]),
+            {'eso_status', 'calendar_statuses', 'all_possible_texts',
+             'eso_config'})
+
+    def test_calendar_change_sends_only_calendar_statuses(self):
+        self._push('FREE')
+        self._pushed()
+
+        self._push('BUSY')
+        self.assertEqual(
+            self._pushed(),
+            [{'calendar_statuses': _calendar_statuses('BUSY')}])
+
+    def test_change_back_to_earlier_payload_still_pushes(self):
+        for status in ('FREE', 'BUSY', 'FREE'):
+            self._push(status)
+
+        self.assertEqual(self._pushed()[1:], [
+            {'calendar_statuses': _calendar_statuses('BUSY')},
+            {'calendar_statuses': _calendar_statuses('FREE')},
+        ])
+
+    def test_identical_payloads_push_once(self):
+        self._push('FREE')
+        self._push('FREE')
+        self.assertEqual(self.emit.call_count, 1)
+
+    def test_eso_only_change_still_pushes(self):
+        self._push('FREE')
+        self._pushed()
+
+        dashboard_server.ESO_STATUS_CACHE = {'PC NA': 'DOWN', 'PC EU': 'UP'}
+        self._push('FREE')
+        self.assertEqual(
+            self._pushed(),
+            [{'eso_status': {'PC NA': 'DOWN', 'PC EU': 'UP'}}])
+
+    def test_connect_sends_full_payload_to_new_client_only(self):
+        # Clients already up to date still get everything on connect
+        self._push('FREE')
+        self._pushed()
+
+        client = dashboard_server.socketio.test_client(dashboard_server.app)
+        self.addCleanup(client.disconnect)
+        sid = dashboard_server.socketio.server.manager.sid_from_eio_sid(
+            client.eio_sid, '/')
+
+        self.emit.assert_called_once_with(
+            'status_update',
+            dashboard_server.get_dashboard_data_from_cache_or_poller(),
+            to=sid)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,18 @@
+"""
+WSGI entry point for running the dashboard under Gunicorn:
+
+    RUN_WORKERS=1 gunicorn -k eventlet -w 1 --worker-connections 2000 \\
+        --bind 0.0.0.0:5000 wsgi:application
+
+Importing dashboard_server monkey-patches the stdlib for eventlet. The
+ESO and calendar pollers only start when RUN_WORKERS is '1', so exactly
+one process polls the upstream APIs.
+"""
+import os
+
+from dashboard_server import app, start_background_workers
+
+if os.environ.get('RUN_WORKERS') == '1':
+    start_background_workers()
+
+application = app